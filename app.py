@@ -20,20 +20,33 @@ Cambios clave según tu listado:
 - Excepciones reales únicas (según tu listado).
 
 Requisitos:
-    pip install streamlit requests pandas openpyxl xlrd
+    pip install streamlit requests pandas python-calamine openpyxl
 
 Ejecutar:
     streamlit run app.py
 """
 
 import io
+import hashlib
 import zipfile
+import itertools
 import datetime as dt
-from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pandas as pd
-import requests
 import streamlit as st
+from openpyxl import load_workbook
+
+from src.downloader import (
+    anios_disponibles,
+    descargar_a_temporal,
+    descargar_binario,
+    ext_de_contenido,
+    listar_meses,
+    resolver_url,
+    resolver_varios,
+    volcar_en_zip,
+)
 
 # ------------------------------------------------------------------------------
 # Configuración de la página
@@ -48,313 +61,11 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# ------------------------------------------------------------------------------
-# Constantes y utilidades
-# ------------------------------------------------------------------------------
-BASE_CLOUDFRONT = "https://d1b4gd4m8561gs.cloudfront.net/sites/default/files"
-HEADERS = {"User-Agent": "Mozilla/5.0 (haircuts-app)"}
-
-MESES = [
-    "enero", "febrero", "marzo", "abril", "mayo", "junio",
-    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
-]
-
-def listar_meses():
-    return MESES
-
-def mes_capitalizado(mes: str) -> str:
-    return mes[:1].upper() + mes[1:].lower()
-
-def mes_mayus(mes: str) -> str:
-    return mes.upper()
-
-def validar_existencia(url: str, timeout: int = 15) -> bool:
-    """HEAD -> True si 200. En 405/403 intenta GET con stream para validar existencia."""
-    try:
-        r = requests.head(url, headers=HEADERS, timeout=timeout, allow_redirects=True)
-        if r.status_code == 200:
-            return True
-        # Algunos endpoints no soportan HEAD correctamente
-        if r.status_code in (403, 404, 405):
-            rg = requests.get(url, headers=HEADERS, timeout=timeout, stream=True)
-            return rg.status_code == 200
-        return False
-    except Exception:
-        return False
-
-def descargar_binario(url: str, timeout: int = 30) -> bytes | None:
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=timeout)
-        if r.status_code == 200:
-            return r.content
-        return None
-    except Exception:
-        return None
-
-def ext_from_url(url: str) -> str:
-    low = url.lower()
-    if ".xlsx" in low:
-        return "xlsx"
-    if ".xls" in low:
-        return "xls"
-    if ".pdf" in low:
-        return "pdf"
-    return "bin"
-
-# ------------------------------------------------------------------------------
-# Construcción de catálogo por (tipo, año, mes)
-# ------------------------------------------------------------------------------
-def _dedup(seq):
-    """Elimina duplicados preservando orden."""
-    vistos = set()
-    out = []
-    for x in seq:
-        if x not in vistos:
-            out.append(x); vistos.add(x)
-    return out
-
-def _urls_legado_por_mes(tipo: str, anio: int, mes: str) -> list[str]:
-    """
-    Variantes 'legadas' preferidas por año:
-    - Raíz y /paginas/ con 'Haircut' y 'Haircuts' en xlsx/xls.
-    - Para deuda externa, también PDF en raíz y /paginas/ con HAIRCUT_{MES_UP}_{AÑO}.
-    - Variantes con guion bajo: Haircut_{mes}_{año}.pdf y Haircuts_{mes} {año}.pdf.
-    - Variante hispana: "Haircuts {MesCap} de {Año}.pdf" (raíz).
-    """
-    mes_l = mes.lower()
-    mes_cap = mes_capitalizado(mes_l)
-    mes_up = mes_mayus(mes_l)
-
-    # Preferencias de extensión legada por año
-    if anio in (2019, 2020):
-        exts = ["xls"]
-    elif anio in (2021, 2022, 2023, 2024):
-        exts = ["xlsx", "xls"]
-    else:
-        exts = ["xlsx"]
-
-    urls = []
-
-    # PDFs y variantes específicas para deuda externa (prioridad primero)
-    if tipo == "haircuts-deuda-externa":
-        # HAIRCUT_{MES_UP}_{AÑO} en raíz y /paginas/
-        for base_dir in [BASE_CLOUDFRONT, f"{BASE_CLOUDFRONT}/paginas"]:
-            urls.append(f"{base_dir}/HAIRCUT_{mes_up}_{anio}.pdf")
-            urls.append(f"{base_dir}/HAIRCUT_{mes_up}_{anio}.xls")
-            urls.append(f"{base_dir}/HAIRCUT_{mes_up}_{anio}.xlsx")
-        # Variantes con guion bajo y minúsculas + forma hispana
-        urls.append(f"{BASE_CLOUDFRONT}/paginas/{quote(f'haircut_{mes_up}_{anio}.pdf')}")
-        urls.append(f"{BASE_CLOUDFRONT}/{quote(f'Haircut_{mes_l}_{anio}.pdf')}")
-        urls.append(f"{BASE_CLOUDFRONT}/{quote(f'Haircuts_{mes_l} {anio}.pdf')}")
-        urls.append(f"{BASE_CLOUDFRONT}/{quote(f'Haircuts {mes_cap} de {anio}.pdf')}")
-
-    # 'Haircut' / 'Haircuts' en raíz y /paginas/
-    for prefix in ["Haircut", "Haircuts"]:
-        for ext in exts:
-            fname = f"{prefix} {mes_cap} {anio}.{ext}"
-            urls.append(f"{BASE_CLOUDFRONT}/{quote(fname)}")
-            urls.append(f"{BASE_CLOUDFRONT}/paginas/{quote(fname)}")
-
-    return _dedup(urls)
-
-def _urls_recientes_por_mes(tipo: str, anio: int, mes: str) -> list[str]:
-    """
-    Estructura 'reciente' (haircuts/dcv-haircuts) con reglas específicas:
-      - DEUDA EXTERNA:
-        * 2024-enero..abril  → solo .pdf (salvo excepciones explícitas listadas).
-        * 2024-mayo          → solo _0.xlsx (exclusivo).
-        * 2024-junio..diciembre → solo .xlsx (sin _0).
-        * 2025+ → base 'haircuts-deuda-externa-{mes}-{año}.xlsx' (sin dcv-).
-      - REPOS:
-        * 2024-mayo..diciembre → base 'dcv-haircuts-repos-{mes}-{año}.xlsx'.
-        * 2025+ → base 'haircuts-repos-{mes}-{año}.xlsx' (sin dcv-).
-    """
-    mes_l = mes.lower()
-    tipo_slug = "deuda-externa" if tipo == "haircuts-deuda-externa" else "repos"
-
-    if tipo == "haircuts-deuda-externa":
-        if anio == 2024:
-            base = f"{BASE_CLOUDFRONT}/dcv-haircuts-{tipo_slug}-{mes_l}-{anio}"
-            if mes_l in {"enero", "febrero", "marzo", "abril"}:
-                return [f"{base}.pdf"]
-            if mes_l == "mayo":
-                return [f"{base}_0.xlsx"]
-            return [f"{base}.xlsx"]
-        else:  # 2025+
-            base = f"{BASE_CLOUDFRONT}/haircuts-{tipo_slug}-{mes_l}-{anio}"
-            return [f"{base}.xlsx"]
-    else:  # repos
-        if anio == 2024:
-            base = f"{BASE_CLOUDFRONT}/dcv-haircuts-{tipo_slug}-{mes_l}-{anio}"
-            return [f"{base}.xlsx"]
-        else:  # 2025+
-            base = f"{BASE_CLOUDFRONT}/haircuts-{tipo_slug}-{mes_l}-{anio}"
-            return [f"{base}.xlsx"]
-
-# Excepciones verdaderamente únicas (siguen tu listado)
-EXCEPCIONES_UNICAS: dict[tuple[str, int, str], list[str]] = {
-    # --- Repos marzo 2024 (única estructura)
-    ("haircuts-repos", 2024, "marzo"): [
-        f"{BASE_CLOUDFRONT}/{quote('haircut2024-03-27.xls')}"
-    ],
-    # --- Deuda enero 2024 (xlsx en raíz)
-    ("haircuts-deuda-externa", 2024, "enero"): [
-        f"{BASE_CLOUDFRONT}/{quote('Haircut Enero 2024.xlsx')}"
-    ],
-    # --- Deuda marzo 2024 (pdf en raíz sin dcv)
-    ("haircuts-deuda-externa", 2024, "marzo"): [
-        f"{BASE_CLOUDFRONT}/haircuts-deuda-externa-marzo-2024.pdf"
-    ],
-    # --- Deuda agosto 2024 (xlsx con nombre de repos)
-    ("haircuts-deuda-externa", 2024, "agosto"): [
-        f"{BASE_CLOUDFRONT}/{quote('Haircut-Repos-Agosto-2024.xlsx')}"
-    ],
-    # --- Deuda agosto 2021 (formato 'Mes de Año')
-    ("haircuts-deuda-externa", 2021, "agosto"): [
-        f"{BASE_CLOUDFRONT}/{quote('Haircuts Agosto de 2021.pdf')}"
-    ],
-    # --- Deuda septiembre 2021 (formato 'Mes de Año')
-    ("haircuts-deuda-externa", 2021, "septiembre"): [
-        f"{BASE_CLOUDFRONT}/{quote('Haircuts Septiembre de 2021.pdf')}"
-    ],
-    # --- Deuda marzo 2022 (formato 'Marzo 2022-Haircuts Deuda Externa.pdf')
-    ("haircuts-deuda-externa", 2022, "marzo"): [
-        f"{BASE_CLOUDFRONT}/{quote('Marzo 2022-Haircuts Deuda Externa.pdf')}"
-    ],
-}
-
-def _estructura_deseada(tipo: str, anio: int, mes: str) -> list[str]:
-    """
-    Devuelve la(s) estructura(s) deseada(s) por período:
-    - Excepción única → solo esa.
-    - 2025+ → reciente 'haircuts-...'.
-    - 2024 mayo..dic → 'dcv-haircuts-...' según reglas arriba.
-    - Resto → legados (para deuda, PDF primero).
-    """
-    key = (tipo, anio, mes.lower())
-    if key in EXCEPCIONES_UNICAS:
-        return EXCEPCIONES_UNICAS[key][:]
-
-    # 2025 en adelante: nueva estructura para ambos tipos (base 'haircuts-')
-    if anio >= 2025:
-        return _urls_recientes_por_mes(tipo, anio, mes)
-
-    # 2024: a partir de mayo predominan 'dcv-haircuts-...'
-    if anio == 2024 and mes.lower() in {
-        "mayo", "junio", "julio", "septiembre", "octubre", "noviembre", "diciembre"
-    }:
-        return _urls_recientes_por_mes(tipo, anio, mes)
-
-    # Resto: patrones legados
-    return _urls_legado_por_mes(tipo, anio, mes)
-
-def construir_diccionario_completo(anio_min: int = 2019, anio_max: int | None = None) -> dict[tuple[str, int, str], list[str]]:
-    """Construye el catálogo explicitando la(s) estructura(s) por cada (tipo, año, mes)."""
-    if anio_max is None:
-        anio_max = dt.date.today().year
-
-    salida: dict[tuple[str, int, str], list[str]] = {}
-    for anio in range(anio_min, anio_max + 1):
-        for mes in MESES:
-            for tipo in ["haircuts-repos", "haircuts-deuda-externa"]:
-                salida[(tipo, anio, mes)] = _estructura_deseada(tipo, anio, mes)
-    return salida
-
-# Construcción del catálogo completo
-EXCEPCIONES: dict[tuple[str, int, str], list[str]] = construir_diccionario_completo()
-PREFILL_COMPLETO = True  # el catálogo está completo para (2019..hoy)
-
-# ------------------------------------------------------------------------------
-# Reglas (respaldo; se aplican solo si una clave no está prellenada o si se desea ampliar)
-# ------------------------------------------------------------------------------
-def candidatos_reglas(tipo: str, anio: int, mes: str) -> list[str]:
-    """
-    Reglas generales (solo respaldo). En este refactor, el catálogo está completo,
-    por lo que raramente se usan.
-    """
-    urls: list[str] = []
-    mes_l = mes.lower()
-    mes_cap = mes_capitalizado(mes_l)
-    mes_up = mes_mayus(mes_l)
-
-    # 1) Regla reciente (alineada a _urls_recientes_por_mes)
-    tipo_slug = "deuda-externa" if tipo == "haircuts-deuda-externa" else "repos"
-    if tipo == "haircuts-deuda-externa":
-        if anio == 2024:
-            base_recent = f"{BASE_CLOUDFRONT}/dcv-haircuts-{tipo_slug}-{mes_l}-{anio}"
-            if mes_l in {"enero", "febrero", "marzo", "abril"}:
-                urls.append(f"{base_recent}.pdf")
-            elif mes_l == "mayo":
-                urls.append(f"{base_recent}_0.xlsx")
-            else:
-                urls.append(f"{base_recent}.xlsx")
-        else:
-            base_recent = f"{BASE_CLOUDFRONT}/haircuts-{tipo_slug}-{mes_l}-{anio}"
-            urls.append(f"{base_recent}.xlsx")
-    else:
-        if anio == 2024:
-            base_recent = f"{BASE_CLOUDFRONT}/dcv-haircuts-{tipo_slug}-{mes_l}-{anio}"
-            urls.append(f"{base_recent}.xlsx")
-        else:
-            base_recent = f"{BASE_CLOUDFRONT}/haircuts-{tipo_slug}-{mes_l}-{anio}"
-            urls.append(f"{base_recent}.xlsx")
-
-    # 2) Patrones legados en raíz (sin /paginas/)
-    for prefix in ["Haircut", "Haircuts"]:
-        for ext in ["xlsx", "xls"]:
-            fname = f"{prefix} {mes_cap} {anio}.{ext}"
-            urls.append(f"{BASE_CLOUDFRONT}/{quote(fname)}")
-    # Legados tipo HAIRCUT_ en raíz
-    for ext in ["pdf", "xls", "xlsx"]:
-        urls.append(f"{BASE_CLOUDFRONT}/HAIRCUT_{mes_up}_{anio}.{ext}")
-    # Guion bajo / minúsculas en raíz
-    urls.append(f"{BASE_CLOUDFRONT}/{quote(f'Haircut_{mes_l}_{anio}.pdf')}")
-    urls.append(f"{BASE_CLOUDFRONT}/{quote(f'Haircuts_{mes_l} {anio}.pdf')}")
-    urls.append(f"{BASE_CLOUDFRONT}/{quote(f'Haircuts {mes_cap} de {anio}.pdf')}")
-
-    # 3) Patrones legados en /paginas/
-    for prefix in ["Haircut", "Haircuts"]:
-        for ext in ["xlsx", "xls", "pdf"]:
-            fname = f"{prefix} {mes_cap} {anio}.{ext}"
-            urls.append(f"{BASE_CLOUDFRONT}/paginas/{quote(fname)}")
-    for ext in ["pdf", "xls", "xlsx"]:
-        urls.append(f"{BASE_CLOUDFRONT}/paginas/HAIRCUT_{mes_up}_{anio}.{ext}")
-        urls.append(f"{BASE_CLOUDFRONT}/paginas/{quote(f'haircut_{mes_up}_{anio}.{ext}')}")
-
-    return _dedup(urls)
-
-def construir_candidatos(tipo: str, anio: int, mes: str) -> list[str]:
-    """Catálogo explícito primero; si no hay (o se desactiva prefill), reglas de respaldo."""
-    key = (tipo, anio, mes.lower())
-    vistos = set()
-    cand = []
-
-    if key in EXCEPCIONES:
-        for u in EXCEPCIONES[key]:
-            if u not in vistos:
-                cand.append(u); vistos.add(u)
-        if PREFILL_COMPLETO:
-            return cand
-
-    for u in candidatos_reglas(tipo, anio, mes):
-        if u not in vistos:
-            cand.append(u); vistos.add(u)
-
-    return cand
-
-def resolver_url(tipo: str, anio: int, mes: str) -> tuple[str | None, list[str]]:
-    """Devuelve (primera_url_existente, lista_candidatos_generados) usando HEAD."""
-    cand = construir_candidatos(tipo, anio, mes)
-    for u in cand:
-        if validar_existencia(u):
-            return u, cand
-    return None, cand
-
 # ------------------------------------------------------------------------------
 # Interfaz
 # ------------------------------------------------------------------------------
 hoy = dt.date.today()
-years = list(range(2019, hoy.year + 1))
+years = anios_disponibles()
 
 tipo = st.radio("Tipo de haircuts", ["haircuts-repos", "haircuts-deuda-externa", "ambos"], horizontal=True)
 col1, col2 = st.columns(2)
@@ -368,8 +79,48 @@ modo_batch = st.checkbox("Modo batch: listar todos los meses del año (según ti
 # ------------------------------------------------------------------------------
 # Funciones principales
 # ------------------------------------------------------------------------------
-def flujo_unico(tipo_sel: str, anio_sel: int, mes_sel: str):
+def _huella(blob: bytes) -> str:
+    """Tamaño + BLAKE2b corto del contenido: identifica la versión exacta del archivo."""
+    return f"{len(blob)}:{hashlib.blake2b(blob, digest_size=16).hexdigest()}"
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _preview_df(url: str, ext: str, huella: str, _blob: bytes) -> pd.DataFrame:
+    """
+    Primeras 50 filas del Excel/CSV; cacheado para no re-parsear en cada rerun.
+    La clave es (URL, huella del contenido): si el archivo se republica bajo la misma URL
+    (ETag nuevo), la vista previa cambia con él. `_blob` lleva guion bajo y Streamlit no
+    lo hashea (la huella ya lo identifica).
+    """
+    with io.BytesIO(_blob) as bio:
+        if ext == "csv":
+            return pd.read_csv(bio, nrows=50, dtype_backend="pyarrow")
+        try:
+            # calamine (Rust) lee xlsx y xls, y solo materializa las filas pedidas
+            return pd.read_excel(bio, engine="calamine", sheet_name=0, nrows=50,
+                                 dtype_backend="pyarrow")
+        except Exception:
+            bio.seek(0)
+            return _preview_openpyxl(bio, 50)
+
+def _preview_openpyxl(bio: io.BytesIO, nrows: int) -> pd.DataFrame:
+    """Respaldo: openpyxl en modo read_only, iterando solo encabezado + `nrows` filas."""
+    wb = load_workbook(bio, read_only=True, data_only=True)
+    try:
+        filas = list(itertools.islice(wb.active.iter_rows(values_only=True), nrows + 1))
+    finally:
+        wb.close()
+    if not filas:
+        return pd.DataFrame()
+    # Columnas Arrow: evita la conversión de columnas 'object' al serializar hacia Streamlit
+    return pd.DataFrame(filas[1:], columns=filas[0]).convert_dtypes(dtype_backend="pyarrow")
+
+def _obtener_unico(tipo_sel: str, anio_sel: int, mes_sel: str):
+    """Resuelve y descarga sin tocar la UI (apto para correr en un hilo)."""
     url, cand = resolver_url(tipo_sel, anio_sel, mes_sel)
+    data = descargar_binario(url) if url else None
+    return url, cand, data
+
+def _mostrar_unico(tipo_sel: str, anio_sel: int, mes_sel: str, url, cand, data):
     with st.expander("Diagnóstico: candidatos generados (en orden de validación)"):
         st.dataframe(pd.DataFrame({"URL candidata": cand}), use_container_width=True)
 
@@ -378,12 +129,11 @@ def flujo_unico(tipo_sel: str, anio_sel: int, mes_sel: str):
         return
 
     st.success(f"Archivo encontrado: {url}")
-    data = descargar_binario(url)
     if not data:
         st.error("Fallo en la descarga (GET).")
         return
 
-    ext = ext_from_url(url)
+    ext = ext_de_contenido(data[:8], url)
     nombre = f"{tipo_sel}-{mes_sel}-{anio_sel}.{ext}"
     st.download_button(
         f"Descargar {ext.upper()}",
@@ -393,45 +143,78 @@ def flujo_unico(tipo_sel: str, anio_sel: int, mes_sel: str):
         key=f"dl-{tipo_sel}-{mes_sel}-{anio_sel}"
     )
 
-    if ext in ["xlsx", "xls"]:
+    if ext in ["xlsx", "xls", "csv"]:
         try:
-            with io.BytesIO(data) as bio:
-                engine = "openpyxl" if ext == "xlsx" else "xlrd"
-                df_preview = pd.read_excel(bio, engine=engine)
+            df_preview = _preview_df(url, ext, _huella(data), data)
             st.subheader("Vista previa (primeras filas)")
-            st.dataframe(df_preview.head(50), use_container_width=True)
+            st.dataframe(df_preview, use_container_width=True, hide_index=True)
         except Exception as e:
-            st.warning(f"No fue posible mostrar vista previa del Excel: {e}")
+            st.warning(f"No fue posible mostrar vista previa del archivo: {e}")
     else:
         st.caption("Vista previa no disponible para archivos PDF u otros formatos.")
 
-def flujo_batch(tipo_sel: str, anio_sel: int):
+# Encabezados de la vista de un mes cuando se piden ambos tipos
+TITULOS_TIPO = {"haircuts-repos": "Repos", "haircuts-deuda-externa": "Deuda Externa"}
+
+def calcular_unico(tipo_sel: str, anio_sel: int, mes_sel: str) -> dict[str, tuple]:
+    """Red de la vista de un mes: {tipo: (url, candidatos, bytes)}; 'ambos' en paralelo."""
+    if tipo_sel != "ambos":
+        return {tipo_sel: _obtener_unico(tipo_sel, anio_sel, mes_sel)}
+    # Resolución + descarga de ambos tipos a la vez; el render sigue siendo secuencial
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        futuros = {t: ex.submit(_obtener_unico, t, anio_sel, mes_sel) for t in TITULOS_TIPO}
+        return {t: f.result() for t, f in futuros.items()}
+
+def mostrar_unico(anio_sel: int, mes_sel: str, resultados: dict[str, tuple]):
+    for i, (t, res) in enumerate(resultados.items()):
+        if len(resultados) > 1:
+            if i:
+                st.markdown("---")
+            st.markdown(f"### {TITULOS_TIPO[t]}")
+        _mostrar_unico(t, anio_sel, mes_sel, *res)
+
+def calcular_batch(tipo_sel: str, anio_sel: int) -> tuple[list[dict], bytes]:
     meses_l = listar_meses()
     tipos = ["haircuts-repos", "haircuts-deuda-externa"] if tipo_sel == "ambos" else [tipo_sel]
 
-    resultados = []
+    # Resolución concurrente de todos los (mes, tipo); la UI se escribe después
+    trabajos = [(m, t) for m in meses_l for t in tipos]
+    urls = resolver_varios([(t, anio_sel, m) for m, t in trabajos])
+
+    resultados = {
+        (m, t): {"Mes": m, "Tipo": t, "Estado": "No disponible", "URL": None}
+        for (m, t), url in zip(trabajos, urls) if not url
+    }
     zip_buf = io.BytesIO()
-    with zipfile.ZipFile(zip_buf, "w") as zf:
-        for m in meses_l:
-            for t in tipos:
-                url, _ = resolver_url(t, anio_sel, m)
-                if url:
-                    data = descargar_binario(url)
-                    if data:
-                        ext = ext_from_url(url)
-                        nombre = f"{t}-{m}-{anio_sel}.{ext}"
-                        zf.writestr(nombre, data)
-                        resultados.append({"Mes": m, "Tipo": t, "Estado": "Disponible", "URL": url})
-                    else:
-                        resultados.append({"Mes": m, "Tipo": t, "Estado": "Error de descarga", "URL": url})
-                else:
-                    resultados.append({"Mes": m, "Tipo": t, "Estado": "No disponible", "URL": None})
+    # Descargas concurrentes; cada archivo entra al ZIP (en este hilo) apenas termina.
+    # xlsx (ya es un zip) y pdf vienen comprimidos: almacenar sin recomprimir
+    with ThreadPoolExecutor(max_workers=8) as ex, \
+            zipfile.ZipFile(zip_buf, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        futuros = {
+            ex.submit(descargar_a_temporal, url): (m, t, url)
+            for (m, t), url in zip(trabajos, urls) if url
+        }
+        for f in as_completed(futuros):
+            m, t, url = futuros[f]
+            tmp = f.result()
+            if tmp is not None:
+                ext = ext_de_contenido(tmp.read(8), url)
+                tmp.seek(0)
+                volcar_en_zip(tmp, zf, f"{t}-{m}-{anio_sel}.{ext}")
+                resultados[(m, t)] = {"Mes": m, "Tipo": t, "Estado": "Disponible", "URL": url}
+            else:
+                resultados[(m, t)] = {"Mes": m, "Tipo": t, "Estado": "Error de descarga", "URL": url}
+
+    # Una sola copia a bytes: es lo que se guarda en la sesión y lo que recibe
+    # st.download_button (que con un BytesIO haría su propio getvalue() en cada rerun)
+    return [resultados[mt] for mt in trabajos], zip_buf.getvalue()
 
+def mostrar_batch(tipo_sel: str, anio_sel: int, filas: list[dict], zip_bytes: bytes):
     st.subheader(f"Resultados – {anio_sel}")
-    st.dataframe(pd.DataFrame(resultados), use_container_width=True)
+    st.dataframe(pd.DataFrame(filas), use_container_width=True)
     st.download_button(
         "Descargar ZIP con archivos disponibles",
-        data=zip_buf.getvalue(),
+        data=zip_bytes,
         file_name=f"haircuts-{anio_sel}.zip",
         mime="application/zip",
         key=f"zip-{tipo_sel}-{anio_sel}"
@@ -440,16 +223,31 @@ def flujo_batch(tipo_sel: str, anio_sel: int):
 # ------------------------------------------------------------------------------
 # Acción
 # ------------------------------------------------------------------------------
+# Se guarda el último resultado de la sesión, ligado a TODAS las entradas del formulario
+# (también `mes` en modo batch). Si cualquiera cambia, se descarta: el resultado ya no
+# corresponde a lo que se ve y no debe redibujarse (ni re-enviar el ZIP) en ese rerun.
+# El dibujo va en un fragmento: pulsar un botón de descarga sólo re-ejecuta el fragmento,
+# no el script entero. Uno solo en sesión, para acotar memoria.
+entradas = (tipo, year, mes, modo_batch)
+if st.session_state.get("_ultimo_flujo", (None,))[0] != entradas:
+    st.session_state.pop("_ultimo_flujo", None)
+
 if st.button("Buscar y descargar"):
     with st.spinner("Procesando…"):
         if modo_batch:
-            flujo_batch(tipo, year)
+            resultado = calcular_batch(tipo, year)
         else:
-            if tipo == "ambos":
-                st.markdown("### Repos")
-                flujo_unico("haircuts-repos", year, mes)
-                st.markdown("---")
-                st.markdown("### Deuda Externa")
-                flujo_unico("haircuts-deuda-externa", year, mes)
-            else:
-                flujo_unico(tipo, year, mes)
+            resultado = calcular_unico(tipo, year, mes)
+    st.session_state["_ultimo_flujo"] = (entradas, resultado)
+
+@st.fragment
+def _mostrar_ultimo():
+    ultimo = st.session_state.get("_ultimo_flujo")
+    if ultimo is None:
+        return
+    if modo_batch:
+        mostrar_batch(tipo, year, *ultimo[1])
+    else:
+        mostrar_unico(year, mes, ultimo[1])
+
+_mostrar_ultimo()
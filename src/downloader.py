@@ -0,0 +1,689 @@
+# -*- coding: utf-8 -*-
+"""
+Descarga de Haircuts DCV desde CloudFront: catálogo de URLs por (tipo, año, mes),
+validación de existencia (GET de 1 byte en paralelo + caché) y descarga.
+Lo usa app.py como capa de interfaz; el módulo se importa una vez por proceso.
+"""
+
+import io
+import os
+import re
+import time
+import string
+import shutil
+import sqlite3
+import zipfile
+import tempfile
+import functools
+import itertools
+import threading
+import datetime as dt
+from types import MappingProxyType
+from typing import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from urllib.parse import quote
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.utils import MESES
+
+# ------------------------------------------------------------------------------
+# Constantes y utilidades
+# ------------------------------------------------------------------------------
+BASE_CLOUDFRONT = "https://d1b4gd4m8561gs.cloudfront.net/sites/default/files"
+HEADERS = {"User-Agent": "Mozilla/5.0 (haircuts-app)"}
+
+# Sesión compartida: reutiliza conexiones TCP/TLS (keep-alive) entre sondeos y descargas.
+# Vive a nivel de módulo, así que sobrevive a los reruns de Streamlit. Casi todo el
+# tráfico va a un único host: pocos pools, pero cada uno con cupo para todos los hilos.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.3, allowed_methods=("GET", "HEAD"),
+                      status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False),
+))
+
+# Sondeos simultáneos contra CloudFront: suficiente para ~1 RTT por resolución sin provocar 429
+SONDEOS_SIMULTANEOS = 16
+
+# Timeout de conexión corto (un host caído se descarta rápido); los parámetros
+# `timeout` de cada función son el de lectura, holgado para cuerpos grandes
+TIMEOUT_CONEXION = 3.05
+
+# Presupuesto total de sondeos en modo batch: lo que no respondió a tiempo queda "No disponible"
+PRESUPUESTO_LOTE = 20.0
+
+# Estados que sí significan "el archivo no existe"; el resto de errores no se cachea
+NO_EXISTE = frozenset({403, 404, 410})
+
+# Fallos de red transitorios (ya reintentados por la sesión); el resto se propaga a Streamlit
+ERRORES_RED = (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError)
+
+def listar_meses() -> tuple[str, ...]:
+    return MESES
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def anios_disponibles() -> tuple[int, ...]:
+    """Años publicados (2019..hoy); una vez por proceso, renovado cada hora por el cambio de año."""
+    return tuple(range(2019, dt.date.today().year + 1))
+
+def mes_capitalizado(mes: str) -> str:
+    return mes[:1].upper() + mes[1:].lower()
+
+def mes_mayus(mes: str) -> str:
+    return mes.upper()
+
+# (minúscula, Capitalizada, MAYÚSCULA) de cada mes, calculadas una sola vez
+_FORMAS_MES: dict[str, tuple[str, str, str]] = {
+    m: (m, mes_capitalizado(m), mes_mayus(m)) for m in MESES
+}
+
+def formas_mes(mes: str) -> tuple[str, str, str]:
+    """Devuelve (minúscula, Capitalizada, MAYÚSCULA) del mes sin recalcularlas."""
+    formas = _FORMAS_MES.get(mes) or _FORMAS_MES.get(mes.lower())
+    if formas is None:
+        mes_l = mes.lower()
+        formas = (mes_l, mes_capitalizado(mes_l), mes_mayus(mes_l))
+    return formas
+
+# ------------------------------------------------------------------------------
+# Caché persistente en disco (SQLite): el archivo histórico publicado no cambia
+# ------------------------------------------------------------------------------
+# Fuera del directorio de trabajo (puede ser de solo lectura); si SQLite falla, la app
+# sigue sin caché en disco
+CACHE_DB = os.path.join(tempfile.gettempdir(), "haircuts_cache.sqlite3")
+TTL_EXISTE = 30 * 86400   # hallazgos: 30 días
+TTL_NO_EXISTE = 600       # fallos: 10 minutos (puede publicarse pronto)
+TTL_DESCARGA = 30 * 86400          # copias de archivos: 30 días
+MAX_DESCARGAS_BYTES = 256 << 20    # y como mucho 256 MB en total (se podan las más viejas)
+
+@st.cache_resource(show_spinner=False)
+def _cache_db() -> tuple[sqlite3.Connection, threading.Lock] | None:
+    """Conexión única por proceso (compartida entre hilos, serializada con un lock), o None."""
+    try:
+        conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS sondeos (url TEXT PRIMARY KEY, existe INTEGER, ts REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS descargas "
+                     "(url TEXT PRIMARY KEY, etag TEXT, data BLOB, ts REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS resoluciones "
+                     "(tipo TEXT, anio INTEGER, mes TEXT, url TEXT, PRIMARY KEY (tipo, anio, mes))")
+        conn.commit()
+    except sqlite3.Error:
+        return None
+    return conn, threading.Lock()
+
+def _consultar(sql: str, params: tuple) -> tuple | None:
+    """Primera fila de una consulta a la caché en disco; None si no hay caché o falla."""
+    db = _cache_db()
+    if db is None:
+        return None
+    conn, lock = db
+    try:
+        with lock:
+            return conn.execute(sql, params).fetchone()
+    except sqlite3.Error:
+        return None
+
+def _escribir(*sentencias: tuple[str, tuple]) -> None:
+    """Ejecuta y confirma escrituras en la caché en disco; sin caché o ante error, no hace nada."""
+    db = _cache_db()
+    if db is None:
+        return
+    conn, lock = db
+    try:
+        with lock:
+            for sql, params in sentencias:
+                conn.execute(sql, params)
+            conn.commit()
+    except sqlite3.Error:
+        pass
+
+def _sondeo_cacheado(url: str) -> bool | None:
+    """Resultado vigente del sondeo de `url`, o None si no hay o expiró."""
+    fila = _consultar("SELECT existe, ts FROM sondeos WHERE url = ?", (url,))
+    if fila is None:
+        return None
+    existe, ts = bool(fila[0]), fila[1]
+    ttl = TTL_EXISTE if existe else TTL_NO_EXISTE
+    return existe if time.time() - ts < ttl else None
+
+def _guardar_sondeo(url: str, existe: bool) -> None:
+    _escribir(("INSERT OR REPLACE INTO sondeos VALUES (?, ?, ?)", (url, int(existe), time.time())))
+
+def periodo_cerrado(anio: int, mes: str) -> bool:
+    """True si (año, mes) ya terminó: su archivo publicado no cambia de URL."""
+    mes_l = mes.lower()
+    if mes_l not in MESES:
+        return False
+    hoy = dt.date.today()
+    return (anio, MESES.index(mes_l) + 1) < (hoy.year, hoy.month)
+
+def _resolucion_guardada(tipo: str, anio: int, mes: str) -> str | None:
+    """URL resuelta de un período cerrado (sin vencimiento), o None."""
+    fila = _consultar("SELECT url FROM resoluciones WHERE tipo = ? AND anio = ? AND mes = ?",
+                      (tipo, anio, mes.lower()))
+    return fila[0] if fila else None
+
+def _guardar_resolucion(tipo: str, anio: int, mes: str, url: str) -> None:
+    """Solo se guardan hallazgos de períodos cerrados; el mes en curso se vuelve a sondear."""
+    if not periodo_cerrado(anio, mes):
+        return
+    _escribir(("INSERT OR REPLACE INTO resoluciones VALUES (?, ?, ?, ?)",
+               (tipo, anio, mes.lower(), url)))
+
+def _descarga_cacheada(url: str) -> tuple[str | None, bytes | None]:
+    """(etag, contenido) de la última descarga exitosa de `url`."""
+    fila = _consultar("SELECT etag, data FROM descargas WHERE url = ? AND ts >= ?",
+                      (url, time.time() - TTL_DESCARGA))
+    return (fila[0], fila[1]) if fila else (None, None)
+
+def _guardar_descarga(url: str, etag: str, data: bytes) -> None:
+    """Guarda la copia y poda: fuera las vencidas y, de las más viejas, lo que exceda el tope."""
+    ahora = time.time()
+    _escribir(
+        ("INSERT OR REPLACE INTO descargas VALUES (?, ?, ?, ?)", (url, etag, data, ahora)),
+        ("DELETE FROM descargas WHERE ts < ?", (ahora - TTL_DESCARGA,)),
+        ("DELETE FROM descargas WHERE url IN (SELECT url FROM ("
+         " SELECT url, SUM(length(data)) OVER (ORDER BY ts DESC) AS acumulado FROM descargas"
+         ") WHERE acumulado > ?)", (MAX_DESCARGAS_BYTES,)),
+    )
+
+class _SondeoFallido(Exception):
+    """Señal interna: el sondeo falló en red; al lanzar, st.cache_data no lo guarda."""
+
+# TTL corto en memoria: los hallazgos siguen vigentes 30 días en disco (lectura local),
+# y así un "no existe" no queda fijado más que unos minutos
+@st.cache_data(ttl=300, max_entries=512, show_spinner=False)
+def _existencia_cacheada(url: str, timeout: int) -> bool:
+    existe = _sondeo_cacheado(url)
+    if existe is None:
+        existe = _validar_en_red(url, timeout)
+        if existe is None:
+            raise _SondeoFallido(url)  # ni en memoria ni en disco: se reintenta la próxima vez
+        _guardar_sondeo(url, existe)
+    return existe
+
+def _sondear(url: str, timeout: int = 15) -> bool | None:
+    """Tri-estado: True/False es una respuesta definitiva del servidor; None, un fallo de red."""
+    try:
+        return _existencia_cacheada(url, timeout)
+    except _SondeoFallido:
+        return None
+
+def _validar_en_red(url: str, timeout: int = 15) -> bool | None:
+    """
+    GET de 1 byte (Range) -> True si 200/206; False solo ante un "no existe" definitivo
+    (403/404/410: CloudFront/S3 responde 403 a objetos ausentes). Un solo viaje tanto
+    para aciertos como para 404, y no depende de que el endpoint soporte HEAD.
+    None ante fallos de red y cualquier otro estado (5xx o 429 que persisten tras los
+    reintentos de la sesión, etc.): no son una respuesta sobre el archivo.
+    """
+    try:
+        with SESSION.get(url, headers={**HEADERS, "Range": "bytes=0-0"},
+                         timeout=(TIMEOUT_CONEXION, timeout), stream=True, allow_redirects=True) as r:
+            if r.status_code == 200:
+                return True  # Range ignorado: no leer el cuerpo completo
+            # Drenar el cuerpo mínimo (1 byte o la página de error) a propósito: solo una
+            # respuesta leída por completo devuelve la conexión keep-alive al pool
+            for _ in r.iter_content(1024):
+                pass
+            if r.status_code == 206:
+                return True
+            return False if r.status_code in NO_EXISTE else None
+    except ERRORES_RED:
+        return None
+
+class _DescargaFallida(Exception):
+    """Señal interna: st.cache_data no guarda llamadas que lanzan, así no cachea fallos."""
+
+@st.cache_data(ttl=24 * 3600, max_entries=64, show_spinner=False)
+def _descargar_cacheado(url: str, timeout: int) -> bytes:
+    data = _descargar_en_red(url, timeout)
+    if data is None:
+        raise _DescargaFallida(url)
+    return data
+
+def descargar_binario(url: str, timeout: int = 30) -> bytes | None:
+    """Descarga con caché en memoria (24 h; los archivos publicados no cambian). None si falla."""
+    try:
+        return _descargar_cacheado(url, timeout)
+    except _DescargaFallida:
+        return None
+
+def _descargar_en_red(url: str, timeout: int = 30) -> bytes | None:
+    """GET condicional (If-None-Match): si el ETag no cambió, reutiliza la copia en disco."""
+    etag, previo = _descarga_cacheada(url)
+    headers = {**HEADERS, "If-None-Match": etag} if etag else HEADERS
+    try:
+        with SESSION.get(url, headers=headers, timeout=(TIMEOUT_CONEXION, timeout), stream=True) as r:
+            if r.status_code == 304 and previo is not None:
+                return previo
+            if r.status_code != 200:
+                return None
+            # BytesIO.getvalue() entrega su búfer sin copiarlo (bytearray -> bytes sí copia)
+            buf = io.BytesIO()
+            for chunk in r.iter_content(65536):
+                buf.write(chunk)
+            data = buf.getvalue()
+            if r.headers.get("ETag"):
+                _guardar_descarga(url, r.headers["ETag"], data)
+            return data
+    except ERRORES_RED:
+        return None
+
+def descargar_a_temporal(url: str, timeout: int = 30) -> tempfile.SpooledTemporaryFile | None:
+    """
+    Descarga en streaming a un archivo temporal 'spooled' (RAM hasta 8 MB, luego disco).
+    Devuelve el temporal rebobinado, o None si falla (sin dejar entradas ZIP a medias).
+    """
+    tmp = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+    listo = False
+    try:
+        with SESSION.get(url, headers=HEADERS, timeout=(TIMEOUT_CONEXION, timeout), stream=True) as r:
+            if r.status_code != 200:
+                return None
+            for chunk in r.iter_content(65536):
+                tmp.write(chunk)
+        tmp.seek(0)
+        listo = True
+        return tmp
+    except Exception:
+        # Cualquier fallo (red, decodificación, OSError al escribir el spool) queda en esta
+        # fila como "Error de descarga" en vez de abortar el lote desde f.result()
+        return None
+    finally:
+        if not listo:
+            tmp.close()
+
+def volcar_en_zip(tmp, zf: zipfile.ZipFile, arcname: str) -> None:
+    """Copia un temporal descargado a una entrada del ZIP y lo cierra."""
+    with tmp, zf.open(arcname, "w", force_zip64=True) as zo:
+        shutil.copyfileobj(tmp, zo, 65536)
+
+# Extensión al final de la ruta, tolerando query string o fragmento (?v=..., #...)
+_EXT_RE = re.compile(r"\.(xlsx|xls|pdf|csv)(?:$|[?#])", re.I)
+
+def ext_from_url(url: str) -> str:
+    m = _EXT_RE.search(url)
+    return m.group(1).lower() if m else "bin"
+
+# Firmas (magic bytes) por extensión: xlsx es un zip, xls es OLE2
+FIRMAS_ARCHIVO = {"xlsx": b"PK\x03\x04", "xls": b"\xd0\xcf\x11\xe0", "pdf": b"%PDF"}
+
+def ext_de_contenido(inicio: bytes, url: str) -> str:
+    """
+    Extensión real según la firma de los primeros bytes (p. ej. un '.xls' legado que
+    en realidad es xlsx). Si ninguna firma coincide, se usa la de la URL.
+    """
+    ext = ext_from_url(url)
+    if inicio.startswith(FIRMAS_ARCHIVO.get(ext, b"\xff")):
+        return ext
+    return next((e for e, firma in FIRMAS_ARCHIVO.items() if inicio.startswith(firma)), ext)
+
+def probar_y_espiar(url: str, timeout: int = 10) -> bool:
+    """
+    GET de 8 bytes (Range): True si el archivo existe y su firma coincide con la extensión.
+    Una firma distinta no descarta el archivo; solo hace que se valide por la vía normal.
+    """
+    try:
+        with SESSION.get(url, headers={**HEADERS, "Range": "bytes=0-7"},
+                         timeout=(TIMEOUT_CONEXION, timeout), stream=True) as r:
+            if r.status_code not in (200, 206):
+                return False
+            inicio = next(r.iter_content(8), b"")
+    except ERRORES_RED:
+        return False
+    firma = FIRMAS_ARCHIVO.get(ext_from_url(url))
+    return firma is None or inicio.startswith(firma)
+
+# ------------------------------------------------------------------------------
+# Construcción de catálogo por (tipo, año, mes)
+# ------------------------------------------------------------------------------
+def _dedup(seq):
+    """Elimina duplicados preservando orden (dict conserva el orden de inserción)."""
+    return list(dict.fromkeys(seq))
+
+# Caracteres que quote() deja intactos: nombres formados solo por ellos no se re-codifican
+_NOMBRE_SEGURO = frozenset(string.ascii_letters + string.digits + "_-.")
+
+@functools.lru_cache(maxsize=4096)
+def _quote_nombre(nombre: str) -> str:
+    """quote() solo si el nombre tiene caracteres fuera del conjunto seguro (p. ej. espacios)."""
+    return nombre if _NOMBRE_SEGURO.issuperset(nombre) else quote(nombre)
+
+# Extensiones legadas preferidas por año (resto de años: solo xlsx)
+EXTS_LEGADO: Mapping[int, tuple[str, ...]] = MappingProxyType({
+    2019: ("xls",),
+    2020: ("xls",),
+    2021: ("xlsx", "xls"),
+    2022: ("xlsx", "xls"),
+    2023: ("xlsx", "xls"),
+    2024: ("xlsx", "xls"),
+})
+
+# 2024: deuda externa publicada en PDF (enero..abril) y meses con estructura 'dcv-haircuts-...'
+MESES_PDF_2024 = frozenset({"enero", "febrero", "marzo", "abril"})
+MESES_RECIENTES_2024 = frozenset({
+    "mayo", "junio", "julio", "septiembre", "octubre", "noviembre", "diciembre"
+})
+
+# Plantillas legadas de deuda externa en orden de prioridad: (subdirectorio, nombre)
+_LEGADO_DEUDA_TPLS = (
+    ("", "HAIRCUT_{up}_{anio}.pdf"),
+    ("", "HAIRCUT_{up}_{anio}.xls"),
+    ("", "HAIRCUT_{up}_{anio}.xlsx"),
+    ("/paginas", "HAIRCUT_{up}_{anio}.pdf"),
+    ("/paginas", "HAIRCUT_{up}_{anio}.xls"),
+    ("/paginas", "HAIRCUT_{up}_{anio}.xlsx"),
+    ("/paginas", "haircut_{up}_{anio}.pdf"),
+    ("", "Haircut_{l}_{anio}.pdf"),
+    ("", "Haircuts_{l} {anio}.pdf"),
+    ("", "Haircuts {cap} de {anio}.pdf"),
+)
+
+# Reglas de respaldo en orden de prioridad (tras la regla reciente): raíz y luego /paginas/
+_REGLAS_TPLS = (
+    *(("", f"{p} {{cap}} {{anio}}.{e}") for p in ("Haircut", "Haircuts") for e in ("xlsx", "xls")),
+    *(("", f"HAIRCUT_{{up}}_{{anio}}.{e}") for e in ("pdf", "xls", "xlsx")),
+    ("", "Haircut_{l}_{anio}.pdf"),
+    ("", "Haircuts_{l} {anio}.pdf"),
+    ("", "Haircuts {cap} de {anio}.pdf"),
+    *(("/paginas", f"{p} {{cap}} {{anio}}.{e}") for p in ("Haircut", "Haircuts") for e in ("xlsx", "xls", "pdf")),
+    *(("/paginas", t.format(e)) for e in ("pdf", "xls", "xlsx")
+      for t in ("HAIRCUT_{{up}}_{{anio}}.{}", "haircut_{{up}}_{{anio}}.{}")),
+)
+
+def _expandir(tpls, campos: dict):
+    """Genera las URLs de una tabla de plantillas (subdirectorio, nombre) en orden."""
+    for subdir, tpl in tpls:
+        yield f"{BASE_CLOUDFRONT}{subdir}/{_quote_nombre(tpl.format_map(campos))}"
+
+@functools.lru_cache(maxsize=4096)
+def _urls_legado_por_mes(tipo: str, anio: int, mes: str) -> tuple[str, ...]:
+    """
+    Variantes 'legadas' preferidas por año:
+    - Raíz y /paginas/ con 'Haircut' y 'Haircuts' en xlsx/xls.
+    - Para deuda externa, también PDF en raíz y /paginas/ con HAIRCUT_{MES_UP}_{AÑO}.
+    - Variantes con guion bajo: Haircut_{mes}_{año}.pdf y Haircuts_{mes} {año}.pdf.
+    - Variante hispana: "Haircuts {MesCap} de {Año}.pdf" (raíz).
+    """
+    mes_l, mes_cap, mes_up = formas_mes(mes)
+
+    # Preferencias de extensión legada por año
+    exts = EXTS_LEGADO.get(anio, ("xlsx",))
+
+    urls = []
+
+    # PDFs y variantes específicas para deuda externa (prioridad primero)
+    if tipo == "haircuts-deuda-externa":
+        campos = {"l": mes_l, "cap": mes_cap, "up": mes_up, "anio": anio}
+        urls.extend(_expandir(_LEGADO_DEUDA_TPLS, campos))
+
+    # 'Haircut' / 'Haircuts' en raíz y /paginas/ (el nombre se codifica una sola vez)
+    for prefix in ["Haircut", "Haircuts"]:
+        for ext in exts:
+            fname = _quote_nombre(f"{prefix} {mes_cap} {anio}.{ext}")
+            urls.append(f"{BASE_CLOUDFRONT}/{fname}")
+            urls.append(f"{BASE_CLOUDFRONT}/paginas/{fname}")
+
+    return tuple(_dedup(urls))
+
+@functools.lru_cache(maxsize=4096)
+def _urls_recientes_por_mes(tipo: str, anio: int, mes: str) -> tuple[str, ...]:
+    """
+    Estructura 'reciente' (haircuts/dcv-haircuts) con reglas específicas:
+      - DEUDA EXTERNA:
+        * 2024-enero..abril  → solo .pdf (salvo excepciones explícitas listadas).
+        * 2024-mayo          → solo _0.xlsx (exclusivo).
+        * 2024-junio..diciembre → solo .xlsx (sin _0).
+        * 2025+ → base 'haircuts-deuda-externa-{mes}-{año}.xlsx' (sin dcv-).
+      - REPOS:
+        * 2024-mayo..diciembre → base 'dcv-haircuts-repos-{mes}-{año}.xlsx'.
+        * 2025+ → base 'haircuts-repos-{mes}-{año}.xlsx' (sin dcv-).
+    """
+    mes_l = mes.lower()
+    tipo_slug = "deuda-externa" if tipo == "haircuts-deuda-externa" else "repos"
+
+    if tipo == "haircuts-deuda-externa":
+        if anio == 2024:
+            base = f"{BASE_CLOUDFRONT}/dcv-haircuts-{tipo_slug}-{mes_l}-{anio}"
+            if mes_l in MESES_PDF_2024:
+                return (f"{base}.pdf",)
+            if mes_l == "mayo":
+                return (f"{base}_0.xlsx",)
+            return (f"{base}.xlsx",)
+        else:  # 2025+
+            base = f"{BASE_CLOUDFRONT}/haircuts-{tipo_slug}-{mes_l}-{anio}"
+            return (f"{base}.xlsx",)
+    else:  # repos
+        if anio == 2024:
+            base = f"{BASE_CLOUDFRONT}/dcv-haircuts-{tipo_slug}-{mes_l}-{anio}"
+            return (f"{base}.xlsx",)
+        else:  # 2025+
+            base = f"{BASE_CLOUDFRONT}/haircuts-{tipo_slug}-{mes_l}-{anio}"
+            return (f"{base}.xlsx",)
+
+# Excepciones verdaderamente únicas (siguen tu listado)
+EXCEPCIONES_UNICAS: Mapping[tuple[str, int, str], tuple[str, ...]] = MappingProxyType({
+    # --- Repos marzo 2024 (única estructura)
+    ("haircuts-repos", 2024, "marzo"): (
+        f"{BASE_CLOUDFRONT}/{quote('haircut2024-03-27.xls')}",
+    ),
+    # --- Deuda enero 2024 (xlsx en raíz)
+    ("haircuts-deuda-externa", 2024, "enero"): (
+        f"{BASE_CLOUDFRONT}/{quote('Haircut Enero 2024.xlsx')}",
+    ),
+    # --- Deuda marzo 2024 (pdf en raíz sin dcv)
+    ("haircuts-deuda-externa", 2024, "marzo"): (
+        f"{BASE_CLOUDFRONT}/haircuts-deuda-externa-marzo-2024.pdf",
+    ),
+    # --- Deuda agosto 2024 (xlsx con nombre de repos)
+    ("haircuts-deuda-externa", 2024, "agosto"): (
+        f"{BASE_CLOUDFRONT}/{quote('Haircut-Repos-Agosto-2024.xlsx')}",
+    ),
+    # --- Deuda agosto 2021 (formato 'Mes de Año')
+    ("haircuts-deuda-externa", 2021, "agosto"): (
+        f"{BASE_CLOUDFRONT}/{quote('Haircuts Agosto de 2021.pdf')}",
+    ),
+    # --- Deuda septiembre 2021 (formato 'Mes de Año')
+    ("haircuts-deuda-externa", 2021, "septiembre"): (
+        f"{BASE_CLOUDFRONT}/{quote('Haircuts Septiembre de 2021.pdf')}",
+    ),
+    # --- Deuda marzo 2022 (formato 'Marzo 2022-Haircuts Deuda Externa.pdf')
+    ("haircuts-deuda-externa", 2022, "marzo"): (
+        f"{BASE_CLOUDFRONT}/{quote('Marzo 2022-Haircuts Deuda Externa.pdf')}",
+    ),
+})
+
+# Códigos de estructura por período; las URLs se expanden bajo demanda
+# (con los generadores ya memoizados)
+ESTRUCTURA_UNICA = "unica"
+ESTRUCTURA_RECIENTE = "reciente"
+ESTRUCTURA_LEGADA = "legada"
+
+def _codigo_estructura(tipo: str, anio: int, mes: str) -> str:
+    """
+    Devuelve el código de la estructura deseada por período:
+    - Excepción única → solo esa.
+    - 2025+ → reciente 'haircuts-...'.
+    - 2024 mayo..dic → 'dcv-haircuts-...' según reglas arriba.
+    - Resto → legados (para deuda, PDF primero).
+    """
+    if (tipo, anio, mes.lower()) in EXCEPCIONES_UNICAS:
+        return ESTRUCTURA_UNICA
+
+    # 2025 en adelante: nueva estructura para ambos tipos (base 'haircuts-')
+    if anio >= 2025:
+        return ESTRUCTURA_RECIENTE
+
+    # 2024: a partir de mayo predominan 'dcv-haircuts-...'
+    if anio == 2024 and mes.lower() in MESES_RECIENTES_2024:
+        return ESTRUCTURA_RECIENTE
+
+    # Resto: patrones legados
+    return ESTRUCTURA_LEGADA
+
+def _expandir_estructura(codigo: str, tipo: str, anio: int, mes: str) -> tuple[str, ...]:
+    """URLs concretas de un código de estructura."""
+    if codigo == ESTRUCTURA_UNICA:
+        return EXCEPCIONES_UNICAS[(tipo, anio, mes.lower())]
+    if codigo == ESTRUCTURA_RECIENTE:
+        return _urls_recientes_por_mes(tipo, anio, mes)
+    return _urls_legado_por_mes(tipo, anio, mes)
+
+@functools.lru_cache(maxsize=4096)
+def _estructura_deseada(tipo: str, anio: int, mes: str) -> tuple[str, ...]:
+    """Devuelve la(s) estructura(s) deseada(s) por período (ver `_codigo_estructura`)."""
+    return _expandir_estructura(_codigo_estructura(tipo, anio, mes), tipo, anio, mes)
+
+# El catálogo no se materializa: cada (tipo, año, mes) se resuelve al consultarse
+# (memoizado en `_estructura_deseada`)
+TIPOS: tuple[str, ...] = ("haircuts-repos", "haircuts-deuda-externa")
+PREFILL_COMPLETO = True  # el catálogo está completo para (2019..hoy)
+
+def en_catalogo(tipo: str, anio: int, mes: str) -> bool:
+    """True si (tipo, año, mes) cae dentro del catálogo explícito (2019..hoy)."""
+    return tipo in TIPOS and mes.lower() in MESES and 2019 <= anio <= anios_disponibles()[-1]
+
+# ------------------------------------------------------------------------------
+# Reglas (respaldo; se aplican solo si una clave no está prellenada o si se desea ampliar)
+# ------------------------------------------------------------------------------
+@functools.lru_cache(maxsize=4096)
+def candidatos_reglas(tipo: str, anio: int, mes: str) -> tuple[str, ...]:
+    """
+    Reglas generales (solo respaldo). En este refactor, el catálogo está completo,
+    por lo que raramente se usan. Comparte plantillas con `_urls_legado_por_mes`
+    y la regla reciente con `_urls_recientes_por_mes`.
+    """
+    mes_l, mes_cap, mes_up = formas_mes(mes)
+    campos = {"l": mes_l, "cap": mes_cap, "up": mes_up, "anio": anio}
+    # Una sola pasada: dict.fromkeys deduplica en orden directamente sobre los generadores
+    return tuple(dict.fromkeys(itertools.chain(
+        _urls_recientes_por_mes(tipo, anio, mes), _expandir(_REGLAS_TPLS, campos)
+    )))
+
+def construir_candidatos(tipo: str, anio: int, mes: str) -> list[str]:
+    """
+    Candidatos de primera pasada: solo la tabla por (tipo, año, mes) del catálogo.
+    Las reglas generales quedan como respaldo profundo (ver `resolver_url`) y solo
+    se usan aquí si la clave no está en el catálogo.
+    """
+    if en_catalogo(tipo, anio, mes):
+        return list(_estructura_deseada(tipo, anio, mes.lower()))
+    return list(candidatos_reglas(tipo, anio, mes))
+
+_PENDIENTE = object()
+
+def _primera_existente(cand: list[str]) -> tuple[str | None, bool]:
+    """
+    Sondeos en paralelo; devuelve (primera URL existente respetando el orden de prioridad,
+    segura). `segura` es False si algún candidato de mayor prioridad no pudo sondearse
+    (fallo de red): el resultado vale para mostrar, pero no para fijarlo en caché.
+    Retorna en cuanto todos los candidatos de mayor prioridad que el ganador han
+    respondido, sin esperar al resto (que se cancelan si aún no arrancaron).
+    """
+    if not cand:
+        return None, True
+    ex = ThreadPoolExecutor(max_workers=min(SONDEOS_SIMULTANEOS, len(cand)))
+    try:
+        futuros = {ex.submit(_sondear, u): i for i, u in enumerate(cand)}
+        estado: list = [_PENDIENTE] * len(cand)
+        siguiente = 0
+        for f in as_completed(futuros):
+            estado[futuros[f]] = f.result()
+            while siguiente < len(cand) and estado[siguiente] is not _PENDIENTE:
+                if estado[siguiente]:
+                    return cand[siguiente], None not in estado[:siguiente]
+                siguiente += 1
+        return None, None not in estado
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+def _confirmar_preferido(url: str) -> bool:
+    """Confirma el candidato de mayor prioridad con la caché en disco o con `probar_y_espiar`."""
+    existe = _sondeo_cacheado(url)
+    if existe is None:
+        existe = probar_y_espiar(url)
+        if existe:
+            _guardar_sondeo(url, True)
+    return existe
+
+class _ResolucionIncierta(Exception):
+    """Señal interna: hubo fallos de red al resolver; el resultado se usa pero no se cachea."""
+
+    def __init__(self, resultado: tuple[str | None, list[str]]):
+        super().__init__(resultado[0])
+        self.resultado = resultado
+
+def resolver_url(tipo: str, anio: int, mes: str) -> tuple[str | None, list[str]]:
+    """
+    Devuelve (primera_url_existente, lista_candidatos_generados) sondeando en red.
+    El candidato preferido se confirma primero con un GET de 8 bytes; si falla, se
+    sondean en paralelo los pocos patrones conocidos del período. Las reglas generales
+    solo se sondean si ninguno existe y el catálogo no se declara completo.
+    """
+    try:
+        return _resolver_cacheado(tipo, anio, mes)
+    except _ResolucionIncierta as e:
+        return e.resultado
+
+@st.cache_data(ttl=300, max_entries=256, show_spinner=False)
+def _resolver_cacheado(tipo: str, anio: int, mes: str) -> tuple[str | None, list[str]]:
+    cand = construir_candidatos(tipo, anio, mes)
+    # Períodos cerrados ya resueltos (en disco, sobrevive a reinicios): sin red
+    url = _resolucion_guardada(tipo, anio, mes)
+    if url is not None:
+        return url, cand
+    # Atajo: el candidato preferido casi siempre existe; un GET de 8 bytes lo confirma
+    if cand and _confirmar_preferido(cand[0]):
+        url, segura = cand[0], True
+    else:
+        url, segura = _primera_existente(cand)
+    if url is None and not PREFILL_COMPLETO:
+        vistos = set(cand)
+        profundos = [u for u in candidatos_reglas(tipo, anio, mes) if u not in vistos]
+        cand = cand + profundos
+        url, segura_prof = _primera_existente(profundos)
+        segura = segura and segura_prof
+    if not segura:
+        # Un candidato preferido pudo quedar sin respuesta: no fijar un ganador de menor
+        # prioridad (ni un "no disponible") en memoria ni en disco
+        raise _ResolucionIncierta((url, cand))
+    if url is not None:
+        _guardar_resolucion(tipo, anio, mes, url)
+    return url, cand
+
+def resolver_varios(trabajos: list[tuple[str, int, str]], max_workers: int = SONDEOS_SIMULTANEOS) -> list[str | None]:
+    """
+    Resuelve muchos (tipo, año, mes) a la vez: los sondeos de todos los trabajos comparten
+    un único pool acotado, así el lote tarda lo que el sondeo más lento y no la suma
+    (y nunca más que PRESUPUESTO_LOTE).
+    """
+    guardadas = [_resolucion_guardada(*t) for t in trabajos]
+    cands = [() if g else construir_candidatos(*t) for g, t in zip(guardadas, trabajos)]
+    ex = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futuros = {}
+        for c in cands:
+            for u in c:
+                if u not in futuros:
+                    futuros[u] = ex.submit(_sondear, u)
+        # Sin esperar indefinidamente a un candidato colgado: vale lo que respondió a tiempo.
+        # None = sin respuesta definitiva (fallo de red, fuera de presupuesto o cancelado)
+        wait(futuros.values(), timeout=PRESUPUESTO_LOTE)
+        sondeo = {u: f.result() if f.done() and not f.cancelled() else None
+                  for u, f in futuros.items()}
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    urls = [g or next((u for u in c if sondeo[u]), None) for g, c in zip(guardadas, cands)]
+    for t, g, u, c in zip(trabajos, guardadas, urls, cands):
+        # Persistir solo si todos los candidatos de mayor prioridad respondieron "no existe"
+        if u and not g and all(sondeo[v] is False for v in c[:c.index(u)]):
+            _guardar_resolucion(*t, u)
+    if not PREFILL_COMPLETO:
+        urls = [u or resolver_url(*t)[0] for u, t in zip(urls, trabajos)]
+    return urls
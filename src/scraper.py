@@ -1,31 +1,58 @@
 # -*- coding: utf-8 -*-
+import io
 import re
+import time
+import threading
+from collections import OrderedDict
+from html import unescape
+from typing import NamedTuple
+from urllib.parse import urljoin
+
 import requests
-from bs4 import BeautifulSoup
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.utils import MESES
 
 LISTADO_URL = "https://www.banrep.gov.co/es/sistemas-pago/dcv/haircuts-repos-deuda-externa"
 
+# href de cada <a> sobre el HTML crudo (bytes); el lookbehind descarta data-href, xhref...
+_HREF_RE = re.compile(rb"""<a\s[^>]*?(?<![\w-])href\s*=\s*["']([^"']+)["']""", re.I)
+
+# Extensiones de adjunto aceptadas, por prioridad (menor = preferida)
+PRIORIDAD_EXT = {".xlsx": 0, ".xls": 1, ".csv": 2}
+_EXT_ADJUNTO_RE = re.compile(r"\.(?:xlsx|xls|csv)$", re.I)
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (haircuts-app; +https://github.com/tu-usuario/haircuts-app)"
 }
 
-def listar_meses():
-    """Devuelve lista de dicts con nombres de meses en español."""
-    meses = [
-        {"num": 1, "num_2d": "01", "nombre_largo": "enero"},
-        {"num": 2, "num_2d": "02", "nombre_largo": "febrero"},
-        {"num": 3, "num_2d": "03", "nombre_largo": "marzo"},
-        {"num": 4, "num_2d": "04", "nombre_largo": "abril"},
-        {"num": 5, "num_2d": "05", "nombre_largo": "mayo"},
-        {"num": 6, "num_2d": "06", "nombre_largo": "junio"},
-        {"num": 7, "num_2d": "07", "nombre_largo": "julio"},
-        {"num": 8, "num_2d": "08", "nombre_largo": "agosto"},
-        {"num": 9, "num_2d": "09", "nombre_largo": "septiembre"},
-        {"num": 10, "num_2d": "10", "nombre_largo": "octubre"},
-        {"num": 11, "num_2d": "11", "nombre_largo": "noviembre"},
-        {"num": 12, "num_2d": "12", "nombre_largo": "diciembre"},
-    ]
-    return meses
+# Tope de tamaño de un adjunto (los haircuts publicados pesan unos pocos MB)
+MAX_BYTES = 100 * 1024 * 1024
+
+# Sesión compartida: reutiliza conexiones TCP/TLS con banrep.gov.co entre páginas y descargas
+# (un solo host: pocos pools; HEADERS por defecto en la sesión, no en cada llamada)
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+))
+
+class Mes(NamedTuple):
+    num: int
+    num_2d: str
+    nombre_largo: str
+
+# Tabla fija construida una vez; tuplas inmutables (y serializables con pickle, como
+# exige st.cache_data si se devuelven desde una función cacheada)
+_MESES = tuple(Mes(i, f"{i:02d}", nombre) for i, nombre in enumerate(MESES, start=1))
+
+def listar_meses() -> tuple[Mes, ...]:
+    """Devuelve los meses en español (num, num_2d, nombre_largo), sin reconstruirlos."""
+    return _MESES
 
 def construir_slug_detalle(tipo: str, mes_largo: str, year: int) -> str:
     """
@@ -34,31 +61,81 @@ def construir_slug_detalle(tipo: str, mes_largo: str, year: int) -> str:
     """
     return f"/es/sistemas-pago/dcv/{tipo}-{mes_largo}-{year}"
 
-def _get_soup(url: str) -> BeautifulSoup | None:
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+# Caché propia del HTML (única copia del cuerpo): url -> (momento, ETag, Last-Modified, HTML).
+# Fresca durante TTL_HTML; vencida, se revalida con GET condicional y un 304 la reutiliza.
+# Acotada a MAX_HTML páginas (LRU): en la práctica el listado y algunos detalles.
+TTL_HTML = 600
+MAX_HTML = 16
+_HTML: OrderedDict[str, tuple[float, str | None, str | None, bytes]] = OrderedDict()
+_HTML_LOCK = threading.Lock()
+
+def _fetch_html(url: str) -> bytes:
+    """
+    HTML crudo de `url`: se guardan los bytes y las búsquedas de href los escanean
+    directamente. Si falla lanza, así los llamadores cacheados no guardan errores.
+    """
+    with _HTML_LOCK:
+        previo = _HTML.get(url)
+        if previo is not None:
+            _HTML.move_to_end(url)
+    if previo is not None and time.monotonic() - previo[0] < TTL_HTML:
+        return previo[3]
+
+    headers = {}
+    if previo is not None:
+        _, etag, modificado, _ = previo
+        if etag:
+            headers["If-None-Match"] = etag
+        if modificado:
+            headers["If-Modified-Since"] = modificado
+    r = SESSION.get(url, headers=headers, timeout=30)
+    if r.status_code == 304 and previo is not None:
+        html, etag, modificado = previo[3], previo[1], previo[2]
+    else:
         r.raise_for_status()
-        return BeautifulSoup(r.text, "html.parser")
-    except Exception:
-        return None
+        html, etag, modificado = r.content, r.headers.get("ETag"), r.headers.get("Last-Modified")
+    with _HTML_LOCK:
+        _HTML[url] = (time.monotonic(), etag, modificado, html)
+        _HTML.move_to_end(url)
+        while len(_HTML) > MAX_HTML:
+            _HTML.popitem(last=False)
+    return html
 
 def encontrar_url_detalle_mensual(slug_detalle: str) -> str | None:
     """
-    Desde la página de listado general, busca el <a> cuyo href contiene el slug.
-    Devuelve la URL absoluta al detalle, si existe.
+    Devuelve la URL absoluta al detalle mensual, si existe. Primero prueba el slug
+    directamente (un HEAD); si no responde con la página del slug, busca en el listado
+    general el <a> cuyo href contiene el slug.
     """
-    soup = _get_soup(LISTADO_URL)
-    if not soup:
+    try:
+        return _detalle_cacheado(slug_detalle)
+    except Exception:
         return None
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _detalle_cacheado(slug_detalle: str) -> str | None:
+    """
+    Primero se prueba el slug directamente (un HEAD; correcto para casi todas las
+    publicaciones). Si no responde, se busca en el listado: solo se necesitan los href,
+    así que se escanea el HTML crudo con una regex en lugar de construir el árbol
+    completo. Los errores de red del listado lanzan (no se cachean).
+    """
+    try:
+        r = SESSION.head(urljoin(LISTADO_URL, slug_detalle), allow_redirects=True, timeout=10)
+        # Solo si la URL final sigue siendo la del slug: una redirección a una portada
+        # genérica también responde 2xx y no es el detalle
+        if r.ok and slug_detalle.rstrip("/").rsplit("/", 1)[-1] in r.url:
+            return r.url
+    except requests.RequestException:
+        pass
+
+    html = _fetch_html(LISTADO_URL)
     # La tabla lista por año/mes las URLs a cada detalle (Repos/Deuda)  [1](https://www.banrep.gov.co/es/sistemas-pago/dcv/haircuts-repos-deuda-externa)
-    anclas = soup.select("a[href]")
-    for a in anclas:
-        href = a.get("href", "")
-        if slug_detalle in href:
-            if href.startswith("http"):
-                return href
-            else:
-                return "https://www.banrep.gov.co" + href
+    slug_b = slug_detalle.encode("utf-8")
+    for m in _HREF_RE.finditer(html):
+        if slug_b in m.group(1):
+            href = unescape(m.group(1).decode("utf-8", "replace"))
+            return urljoin(LISTADO_URL, href)
     # Fallback: intentar patrón sin guiones (por si el portal cambia el path)
     # (no estricto; sirve como red de seguridad)
     return None
@@ -68,31 +145,53 @@ def encontrar_enlace_xlsx(url_detalle: str) -> str | None:
     En la página de detalle, encontrar <a> que apunte a /sites/default/files/... .xlsx
     Según documento de estructura, los adjuntos públicos se sirven bajo ese path.  [2](https://www.banrep.gov.co/es/sistemas-pago/dcv/estructura-archivo-emisiones-vigentes-haircuts)
     """
-    soup = _get_soup(url_detalle)
-    if not soup:
+    try:
+        return _enlace_cacheado(url_detalle)
+    except Exception:
         return None
 
-    # Regla primaria: .xlsx bajo /sites/default/files/
-    for a in soup.select("a[href]"):
-        href = a.get("href", "")
-        if "/sites/default/files/" in href and href.lower().endswith(".xlsx"):
-            if href.startswith("http"):
-                return href
-            else:
-                return "https://www.banrep.gov.co" + href
-
-    # Fallback: admitir .xls o .csv si alguna publicación particular lo usa
-    for a in soup.select("a[href]"):
-        href = a.get("href", "")
-        if "/sites/default/files/" in href and re.search(r"\.(xls|csv)$", href, flags=re.I):
-            return "https://www.banrep.gov.co" + href if not href.startswith("http") else href
+@st.cache_data(ttl=600, show_spinner=False)
+def _enlace_cacheado(url_detalle: str) -> str | None:
+    """
+    Búsqueda del adjunto memoizada entre reruns; si la descarga del HTML falla, lanza.
+    Igual que en el listado, basta con los href: regex sobre el HTML crudo, sin árbol.
+    """
+    html = _fetch_html(url_detalle)
 
-    return None
+    # Un solo recorrido: .xlsx es la regla primaria; .xls o .csv si alguna publicación
+    # particular los usa. Se corta al primer .xlsx.
+    mejor, mejor_href = len(PRIORIDAD_EXT), None
+    for m in _HREF_RE.finditer(html):
+        raw = m.group(1)
+        if b"/sites/default/files/" not in raw:
+            continue
+        href = unescape(raw.decode("utf-8", "replace"))
+        e = _EXT_ADJUNTO_RE.search(href)
+        prio = PRIORIDAD_EXT[e.group(0).lower()] if e else mejor
+        if prio < mejor:
+            mejor, mejor_href = prio, href
+            if mejor == 0:
+                break
+
+    return urljoin(url_detalle, mejor_href) if mejor_href else None
 
 def descargar_binario(url_archivo: str) -> bytes | None:
     try:
-        r = requests.get(url_archivo, headers=HEADERS, timeout=60, stream=True)
-        r.raise_for_status()
-        return r.content
+        return _descargar_cacheado(url_archivo)
     except Exception:
         return None
+
+# Persistido en disco (sin TTL: Streamlit lo ignora con persist): sobrevive a reinicios
+@st.cache_data(persist="disk", max_entries=128, show_spinner=False)
+def _descargar_cacheado(url_archivo: str) -> bytes:
+    """El adjunto no cambia bajo la misma URL; los fallos lanzan y no quedan cacheados."""
+    with SESSION.get(url_archivo, timeout=60, stream=True) as r:
+        r.raise_for_status()
+        if int(r.headers.get("Content-Length") or 0) > MAX_BYTES:
+            raise ValueError(f"Adjunto demasiado grande: {url_archivo}")
+        buf = io.BytesIO()
+        for chunk in r.iter_content(64 * 1024):
+            buf.write(chunk)
+            if buf.tell() > MAX_BYTES:
+                raise ValueError(f"Adjunto demasiado grande: {url_archivo}")
+        return buf.getvalue()
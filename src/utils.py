@@ -1,2 +1,8 @@
 # -*- coding: utf-8 -*-
 # Espacio para helpers adicionales (validaciones, logs, etc.)
+
+# Meses en español (minúscula), compartidos por src/downloader.py y src/scraper.py
+MESES: tuple[str, ...] = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la resolución de URLs contra CloudFront (sin red: la sesión se simula)."""
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("requests")
+
+import streamlit as st
+
+from src import downloader
+
+
+class _Respuesta:
+    """Respuesta mínima de `SESSION.get(..., stream=True)` usada como context manager."""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size=1):
+        yield b"x"
+
+
+@pytest.fixture
+def cache_limpia(tmp_path, monkeypatch):
+    """Base SQLite propia por prueba y cachés de Streamlit vacías."""
+    monkeypatch.setattr(downloader, "CACHE_DB", str(tmp_path / "cache.sqlite3"))
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    yield
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+def _simular_sesion(monkeypatch, estados: dict[str, int]):
+    """Cada URL responde con su estado; las no listadas, 404."""
+    monkeypatch.setattr(downloader.SESSION, "get",
+                        lambda url, **kw: _Respuesta(estados.get(url, 404)))
+
+
+TRABAJO = ("haircuts-repos", 2021, "marzo")  # período cerrado: se persistiría
+
+
+def test_503_en_el_preferido_no_fija_la_resolucion(cache_limpia, monkeypatch):
+    cand = downloader.construir_candidatos(*TRABAJO)
+    _simular_sesion(monkeypatch, {cand[0]: 503, cand[1]: 206})
+
+    assert downloader.resolver_varios([TRABAJO]) == [cand[1]]
+    assert downloader._resolucion_guardada(*TRABAJO) is None
+    assert downloader._sondeo_cacheado(cand[0]) is None
+
+
+def test_404_en_el_preferido_si_fija_la_resolucion(cache_limpia, monkeypatch):
+    cand = downloader.construir_candidatos(*TRABAJO)
+    _simular_sesion(monkeypatch, {cand[0]: 404, cand[1]: 206})
+
+    assert downloader.resolver_varios([TRABAJO]) == [cand[1]]
+    assert downloader._resolucion_guardada(*TRABAJO) == cand[1]